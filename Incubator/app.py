@@ -1,30 +1,63 @@
 import os
+import json
 import logging
 import time
-from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
+import queue
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, SysLogHandler
+from dataclasses import dataclass, field, asdict, replace
+from functools import wraps, lru_cache
+from flask import Flask, Response, stream_with_context, render_template, request, redirect, url_for, jsonify, session, flash
 import threading
 
-# Import our custom modules
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Console logging is only wanted when running the development server;
+# under systemd, stderr already ends up in the journal
+DEBUG = __name__ == '__main__' or os.environ.get('FLASK_DEBUG') == '1'
+
+# Set up logging
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+# Send logs to the local syslog daemon (facility local0) over its UNIX
+# datagram socket; see incubator-rsyslog.conf. Fall back to a log file
+# and the console where there is no syslog socket.
+if os.path.exists('/dev/log'):
+    syslog_handler = SysLogHandler(address='/dev/log', facility=SysLogHandler.LOG_LOCAL0)
+    syslog_handler.ident = 'incubator: '
+    syslog_handler.setFormatter(logging.Formatter('%(name)s - %(levelname)s - %(message)s'))
+    log_handlers = [syslog_handler]
+    if DEBUG:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(log_formatter)
+        log_handlers.append(console_handler)
+else:
+    if not os.path.exists('logs'):
+        os.makedirs('logs')
+    log_handlers = [logging.FileHandler('logs/incubator.log'), logging.StreamHandler()]
+    for handler in log_handlers:
+        handler.setFormatter(log_formatter)
+
+# Log calls only enqueue the record; a listener thread does the actual
+# I/O so the monitoring threads never block on it
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(log_queue, *log_handlers)
+logging.root.setLevel(logging.INFO)
+logging.root.addHandler(QueueHandler(log_queue))
+log_listener.start()
+logger = logging.getLogger('incubator')
+
+# Import our custom modules once logging is set up, so warnings raised while
+# they initialize (e.g. the GPIO pin factory choice) reach the log
 from relay_controller import RelayController
 from sensor_reader import SensorReader
 from emergency_handler import EmergencyHandler
 from data_logger import DataLogger
 
-# Set up logging
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/incubator.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger('incubator')
-
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "incubator_secret_key")
@@ -35,6 +68,21 @@ SAFE_TEMP_HIGH = 102.0  # °F
 SAFE_HUMIDITY_LOW = 40.0  # %
 SAFE_HUMIDITY_HIGH = 70.0  # %
 
+# Monitoring cadence
+SENSOR_INTERVAL = 5  # seconds between sensor readings
+LOG_INTERVAL = 60    # seconds between analytics data points
+
+# Maximum number of distinct alerts kept at once
+MAX_ALERTS = 32
+
+# Seconds between keepalive comments on idle status streams
+STREAM_KEEPALIVE = 15
+
+# Maximum concurrent status streams. Each open stream holds a server thread
+# for as long as the page is open, so this must stay well below the gunicorn
+# --threads count in incubator.service to leave room for /api/control.
+MAX_STREAMS = 4
+
 # Default target values
 app.config['TARGET_TEMPERATURE'] = 99.5  # °F
 app.config['TARGET_HUMIDITY'] = 55.0  # %
@@ -61,23 +109,73 @@ except Exception as e:
     # In a real scenario, we might want to exit or fail gracefully
     # For now, we'll continue but many functions will not work properly
 
+# Snapshot of the incubator state served by the API. Snapshots are never
+# modified: writers build a new one and rebind the global (an atomic
+# operation in CPython), so readers always see a consistent state.
+@dataclass(frozen=True, slots=True)
+class IncubatorState:
+    temperature: float = 0.0
+    humidity: float = 0.0
+    heater1_on: bool = False
+    heater2_on: bool = False
+    humidifier_on: bool = False
+    is_overheat: bool = False
+    last_updated: float = field(default_factory=time.time)
+    alerts: tuple = ()
+    target_temperature: float = 0.0
+    target_humidity: float = 0.0
+
 # Global state variables
-incubator_state = {
-    "temperature": 0.0,
-    "humidity": 0.0,
-    "heater1_on": False,
-    "heater2_on": False,
-    "humidifier_on": False,
-    "is_overheat": False,
-    "last_updated": time.time(),
-    "alerts": [],
-    "target_temperature": app.config['TARGET_TEMPERATURE'],
-    "target_humidity": app.config['TARGET_HUMIDITY']
-}
+incubator_state = IncubatorState(
+    target_temperature=app.config['TARGET_TEMPERATURE'],
+    target_humidity=app.config['TARGET_HUMIDITY']
+)
+
+# Serializes writers so concurrent updates from the API and the state
+# updater thread don't overwrite each other; readers never need it
+state_lock = threading.Lock()
+
+# One queue per connected /api/status/stream client. Each holds at most the
+# latest snapshot, so a slow client skips stale states instead of piling up.
+status_subscribers = set()
+subscribers_lock = threading.Lock()
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+def update_state(**changes):
+    """Publish a new state snapshot with the given fields changed."""
+    global incubator_state
+    with state_lock:
+        incubator_state = state = replace(incubator_state, **changes)
+    
+    # Push the snapshot to stream clients
+    with subscribers_lock:
+        for updates in status_subscribers:
+            try:
+                updates.get_nowait()
+            except queue.Empty:
+                pass
+            updates.put_nowait(state)
+    return state
+
+# Sensor readings are passed from the sensor thread to the state updater
+# thread as (temperature, humidity, is_overheat, monotonic_time, error) tuples
+readings_queue = queue.Queue()
 
 # Flag to control monitoring thread
 monitor_running = True
 
+# Encode large JSON payloads with orjson when it is installed
+def dump_json(data):
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+# Serialized analytics data. The time of the last logged row is part of
+# the key, so an entry stays valid until a new row is logged.
+@lru_cache(maxsize=8)
+def analytics_payload(days, interval, last_logged_ts):
+    return dump_json(data_logger.get_recent_data(days=days, interval_minutes=interval))
+
 # Login required decorator
 def login_required(f):
     @wraps(f)
@@ -87,112 +185,168 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Monitoring thread function
+# Sensor thread function
 def monitor_sensors():
     global monitor_running
     logger.info("Starting sensor monitoring thread")
     
+    # Deadlines use the monotonic clock so the cadence doesn't drift or
+    # jump when the system clock is adjusted
+    next_tick = time.monotonic()
+    
     while monitor_running:
+        # Try to read temperature and humidity from sensor
+        sensor_error = None
         try:
-            # Try to read temperature and humidity from sensor
-            try:
-                temp, humidity = sensor_reader.read_sensor()
-            except Exception as e:
-                # Handle sensor read errors
-                error_msg = str(e)
-                logger.error(f"Sensor error: {error_msg}")
-                # Add error to alerts
-                incubator_state["alerts"].append({"type": "danger", "message": f"Sensor error: {error_msg}"})
-                # Set default values to indicate error state
-                temp = 0
-                humidity = 0
-                
-            # Check overheat condition with extra safeguards
-            try:
-                is_overheat = emergency_handler.check_overheat()
-            except Exception as e:
-                logger.error(f"Error checking overheat status: {e}")
-                is_overheat = False  # Assume safe if check fails
+            temp, humidity = sensor_reader.read_sensor()
+        except Exception as e:
+            # Handle sensor read errors
+            sensor_error = str(e)
+            logger.error(f"Sensor error: {sensor_error}")
+            # Set default values to indicate error state
+            temp = 0
+            humidity = 0
             
-            # Update global state
-            incubator_state["temperature"] = temp
-            incubator_state["humidity"] = humidity
-            incubator_state["is_overheat"] = is_overheat
-            incubator_state["last_updated"] = time.time()
+        # Check overheat condition with extra safeguards
+        try:
+            is_overheat = emergency_handler.check_overheat()
+        except Exception as e:
+            logger.error(f"Error checking overheat status: {e}")
+            is_overheat = False  # Assume safe if check fails
+        
+        # Hand the reading to the state updater thread
+        readings_queue.put((temp, humidity, is_overheat, time.monotonic(), sensor_error))
             
-            # Clear old alerts if sensor is working
-            if temp > 0 or humidity > 0:
-                incubator_state["alerts"] = []
+        # Wait until the next reading is due; after an overrun, restart the
+        # schedule from now rather than catching up with back-to-back reads
+        next_tick += SENSOR_INTERVAL
+        now = time.monotonic()
+        if next_tick <= now:
+            next_tick = now + SENSOR_INTERVAL
+        time.sleep(next_tick - now)
+
+# Record an alert in the alerts map. Repeats of the same condition update
+# one entry instead of adding another, and the map never exceeds MAX_ALERTS.
+def raise_alert(alerts, alert_type, template, **values):
+    key = (alert_type, template)
+    now = time.time()
+    message = template.format(**values)
+    previous = alerts.pop(key, None)
+    alerts[key] = {
+        "type": alert_type,
+        "message": message,
+        "count": previous["count"] + 1 if previous else 1,
+        "first_seen": previous["first_seen"] if previous else now,
+        "last_seen": now
+    }
+    if len(alerts) > MAX_ALERTS:
+        alerts.popitem(last=False)
+    return key, message
+
+# State updater thread function
+def process_readings():
+    next_log_at = time.monotonic() + LOG_INTERVAL
+    
+    # Current alerts keyed by (type, template); owned by this thread.
+    # Entries are replaced rather than modified, so published snapshots
+    # can share them safely.
+    alerts = OrderedDict()
+    
+    while True:
+        # Block until the sensor thread delivers a reading (None means stop)
+        reading = readings_queue.get()
+        if reading is None:
+            break
+        temp, humidity, is_overheat, read_at, sensor_error = reading
+        state = incubator_state
+        raised = set()
+        
+        try:
+            if sensor_error is not None:
+                key, _ = raise_alert(alerts, "danger", "Sensor error: {error}", error=sensor_error)
+                raised.add(key)
             
             # Only check environmental alerts if sensors are working (not giving zero readings)
             if temp > 0:
                 # Check for temperature alerts
                 if temp < SAFE_TEMP_LOW:
-                    alert = f"WARNING: Temperature too low ({temp:.1f}°F)"
-                    incubator_state["alerts"].append({"type": "warning", "message": alert})
+                    key, alert = raise_alert(alerts, "warning", "WARNING: Temperature too low ({temp:.1f}°F)", temp=temp)
+                    raised.add(key)
                     logger.warning(alert)
                 elif temp > SAFE_TEMP_HIGH:
-                    alert = f"WARNING: Temperature too high ({temp:.1f}°F)"
-                    incubator_state["alerts"].append({"type": "warning", "message": alert})
+                    key, alert = raise_alert(alerts, "warning", "WARNING: Temperature too high ({temp:.1f}°F)", temp=temp)
+                    raised.add(key)
                     logger.warning(alert)
             
             if humidity > 0:
                 # Check for humidity alerts
                 # Only show humidity alerts if humidifier is on or if humidity is too high
                 # This prevents low humidity warnings when humidifier is deliberately off
-                if incubator_state["humidifier_on"] and humidity < SAFE_HUMIDITY_LOW:
-                    alert = f"WARNING: Humidity too low ({humidity:.1f}%)"
-                    incubator_state["alerts"].append({"type": "warning", "message": alert})
+                if state.humidifier_on and humidity < SAFE_HUMIDITY_LOW:
+                    key, alert = raise_alert(alerts, "warning", "WARNING: Humidity too low ({humidity:.1f}%)", humidity=humidity)
+                    raised.add(key)
                     logger.warning(alert)
                 elif humidity > SAFE_HUMIDITY_HIGH:
-                    alert = f"WARNING: Humidity too high ({humidity:.1f}%)"
-                    incubator_state["alerts"].append({"type": "warning", "message": alert})
+                    key, alert = raise_alert(alerts, "warning", "WARNING: Humidity too high ({humidity:.1f}%)", humidity=humidity)
+                    raised.add(key)
                     logger.warning(alert)
                 
             # Check for overheat emergency
             if is_overheat:
-                alert = "EMERGENCY: Overheat detected! Heaters disabled."
-                incubator_state["alerts"].append({"type": "danger", "message": alert})
+                key, alert = raise_alert(alerts, "danger", "EMERGENCY: Overheat detected! Heaters disabled.")
+                raised.add(key)
                 logger.error(alert)
                 
                 # Turn off heaters for safety
-                relay_controller.turn_off_relay(RelayController.HEATER1)
-                relay_controller.turn_off_relay(RelayController.HEATER2)
-                incubator_state["heater1_on"] = False
-                incubator_state["heater2_on"] = False
+                relay_controller.turn_off_all_heaters()
             
-            # Update relay states
-            incubator_state["heater1_on"] = relay_controller.get_relay_state(RelayController.HEATER1)
-            incubator_state["heater2_on"] = relay_controller.get_relay_state(RelayController.HEATER2)
-            incubator_state["humidifier_on"] = relay_controller.get_relay_state(RelayController.HUMIDIFIER)
+            # Clear alerts that weren't raised again if sensor is working
+            if temp > 0 or humidity > 0:
+                for key in [key for key in alerts if key not in raised]:
+                    del alerts[key]
+            
+            # Publish the new snapshot, including current relay states
+            heater1_on, heater2_on, humidifier_on = relay_controller.get_all_states()
+            state = update_state(
+                temperature=temp,
+                humidity=humidity,
+                is_overheat=is_overheat,
+                last_updated=time.time(),
+                alerts=tuple(alerts.values()),
+                heater1_on=heater1_on,
+                heater2_on=heater2_on,
+                humidifier_on=humidifier_on
+            )
             
             # Log data periodically (every minute)
-            if int(time.time()) % 60 < 5:  # Log approximately every minute
-                logger.info(f"Status: Temp={temp:.1f}°F, Humidity={humidity:.1f}%, " +
-                           f"Heater1={'ON' if incubator_state['heater1_on'] else 'OFF'}, " +
-                           f"Heater2={'ON' if incubator_state['heater2_on'] else 'OFF'}, " +
-                           f"Humidifier={'ON' if incubator_state['humidifier_on'] else 'OFF'}")
+            if read_at >= next_log_at:
+                # After a stall, restart the schedule from this reading so the
+                # next one doesn't log a second row straight away
+                next_log_at += LOG_INTERVAL
+                if next_log_at <= read_at:
+                    next_log_at = read_at + LOG_INTERVAL
+                
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(f"Status: Temp={temp:.1f}°F, Humidity={humidity:.1f}%, " +
+                               f"Heater1={'ON' if state.heater1_on else 'OFF'}, " +
+                               f"Heater2={'ON' if state.heater2_on else 'OFF'}, " +
+                               f"Humidifier={'ON' if state.humidifier_on else 'OFF'}")
                 
                 # Log data to CSV file for analytics
                 data_logger.log_data(
                     temperature=temp,
                     humidity=humidity,
-                    heater1_on=incubator_state["heater1_on"],
-                    heater2_on=incubator_state["heater2_on"],
-                    humidifier_on=incubator_state["humidifier_on"],
-                    target_temperature=incubator_state["target_temperature"],
-                    target_humidity=incubator_state["target_humidity"]
+                    heater1_on=state.heater1_on,
+                    heater2_on=state.heater2_on,
+                    humidifier_on=state.humidifier_on,
+                    target_temperature=state.target_temperature,
+                    target_humidity=state.target_humidity
                 )
                 
-                # Purge old data files (older than 21 days)
-                data_logger.purge_old_data()
-                
         except Exception as e:
             logger.error(f"Error in monitoring thread: {e}")
-            incubator_state["alerts"].append({"type": "danger", "message": f"Sensor error: {str(e)}"})
-            
-        # Wait before next reading
-        time.sleep(5)  # Check sensors every 5 seconds
+            raise_alert(alerts, "danger", "Sensor error: {error}", error=str(e))
+            update_state(alerts=tuple(alerts.values()))
 
 # Routes
 @app.route('/')
@@ -249,10 +403,21 @@ def api_analytics():
         if interval < 1:
             interval = 10  # Default to 10 minutes if invalid
         
-        # Get data from the data logger
-        data = data_logger.get_recent_data(days=days, interval_minutes=interval)
+        # The ETag changes whenever a new row is logged, so polling clients
+        # get a 304 until then
+        last_logged_ts = data_logger.last_logged_ts
+        etag = f"{days}-{interval}-{last_logged_ts:.3f}"
+        
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(analytics_payload(days, interval, last_logged_ts),
+                                mimetype='application/json')
         
-        return jsonify(data)
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = 10
+        return response
     except Exception as e:
         logger.error(f"Error fetching analytics data: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -260,7 +425,44 @@ def api_analytics():
 @app.route('/api/status')
 @login_required
 def api_status():
-    return jsonify(incubator_state)
+    return jsonify(asdict(incubator_state))
+
+@app.route('/api/status/stream')
+@login_required
+def api_status_stream():
+    """
+    Server-Sent Events stream of state snapshots, pushed as they change.
+    Returns 503 once MAX_STREAMS are open; the dashboard then polls instead.
+    """
+    if not stream_slots.acquire(blocking=False):
+        return Response(status=503)
+    
+    def generate():
+        updates = queue.Queue(maxsize=1)
+        with subscribers_lock:
+            status_subscribers.add(updates)
+        try:
+            state = incubator_state
+            while True:
+                yield b"data: " + dump_json(asdict(state)) + b"\n\n"
+                
+                # Wait for the next snapshot, sending keepalives while idle
+                while True:
+                    try:
+                        state = updates.get(timeout=STREAM_KEEPALIVE)
+                        break
+                    except queue.Empty:
+                        yield b": keepalive\n\n"
+        finally:
+            with subscribers_lock:
+                status_subscribers.discard(updates)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache'})
+    # Free the slot when the server closes the response, even if the
+    # stream was never iterated
+    response.call_on_close(stream_slots.release)
+    return response
 
 @app.route('/api/control', methods=['POST'])
 @login_required
@@ -282,7 +484,7 @@ def api_control():
         # Don't allow turning on heaters if overheat is active or if last temperature reading is stale
         if action == "on" and (device == "heater1" or device == "heater2"):
             # Check for overheat condition
-            if incubator_state["is_overheat"]:
+            if incubator_state.is_overheat:
                 return jsonify({
                     "success": False, 
                     "message": "Cannot turn on heaters during overheat condition"
@@ -290,7 +492,7 @@ def api_control():
                 
             # Check for sensor failure/disconnection - if last reading is more than 2 minutes old
             current_time = time.time()
-            if current_time - incubator_state["last_updated"] > 120:
+            if current_time - incubator_state.last_updated > 120:
                 logger.error("SAFETY: Temperature sensor readings are stale, refusing to activate heaters")
                 return jsonify({
                     "success": False, 
@@ -317,12 +519,7 @@ def api_control():
             return jsonify({"success": False, "message": f"Unknown action: {action}"}), 400
         
         # Update state after control action
-        if device == 'heater1':
-            incubator_state["heater1_on"] = relay_controller.get_relay_state(relay)
-        elif device == 'heater2':
-            incubator_state["heater2_on"] = relay_controller.get_relay_state(relay)
-        elif device == 'humidifier':
-            incubator_state["humidifier_on"] = relay_controller.get_relay_state(relay)
+        update_state(**{f"{device}_on": relay_controller.get_relay_state(relay)})
             
         return jsonify({"success": True, "message": f"{device} {action} successful"})
         
@@ -360,7 +557,7 @@ def api_settings():
                 
             # Update app config and incubator state
             app.config['TARGET_TEMPERATURE'] = temp_value
-            incubator_state['target_temperature'] = temp_value
+            update_state(target_temperature=temp_value)
             logger.info(f"Temperature target updated to {temp_value}°F")
             
         elif setting == 'humidity':
@@ -374,7 +571,7 @@ def api_settings():
                 
             # Update app config and incubator state
             app.config['TARGET_HUMIDITY'] = humidity_value
-            incubator_state['target_humidity'] = humidity_value
+            update_state(target_humidity=humidity_value)
             logger.info(f"Humidity target updated to {humidity_value}%")
             
         else:
@@ -396,9 +593,11 @@ def api_settings():
 # Flask app context setup and teardown
 hardware_cleaned_up = False
 
-# Start monitoring thread when app starts
+# Start monitoring threads when app starts
 monitor_thread = threading.Thread(target=monitor_sensors, daemon=True)
 monitor_thread.start()
+state_thread = threading.Thread(target=process_readings, daemon=True)
+state_thread.start()
 
 # Setup handler for proper cleanup when the app is stopped
 import atexit
@@ -409,6 +608,7 @@ def cleanup_hardware():
         try:
             # First, stop the monitoring thread safely
             monitor_running = False
+            readings_queue.put(None)  # Wake the state updater so it can exit
             time.sleep(1)  # Give thread chance to complete current cycle
             
             # Set flag to prevent double cleanup
@@ -419,10 +619,15 @@ def cleanup_hardware():
             if 'emergency_handler' in globals():
                 emergency_handler.cleanup()
             if 'relay_controller' in globals():
-                relay_controller.cleanup()
+                relay_controller.cleanup(settle_time=0.1)
+            if 'data_logger' in globals():
+                data_logger.close()
             logger.info("Hardware resources cleaned up")
         except Exception as e:
             logger.error(f"Error during hardware cleanup: {e}")
+        
+        # Stop the log listener last so it writes out everything queued above
+        log_listener.stop()
 
 # Register the cleanup function to be called on exit
 atexit.register(cleanup_hardware)
@@ -430,7 +635,8 @@ atexit.register(cleanup_hardware)
 # When Flask app context is torn down (may happen multiple times in dev mode)
 @app.teardown_appcontext
 def app_cleanup(error):
-    if error:
+    # GeneratorExit is a status stream closing on client disconnect, not an error
+    if error and not isinstance(error, GeneratorExit):
         logger.error(f"Error during app teardown: {error}")
 
 # Run the app
@@ -4,15 +4,24 @@ Logs temperature, humidity, and device states to CSV files for analytics.
 """
 
 import os
-import csv
+import glob
+import mmap
 import time
+import queue
+import atexit
 import datetime
 import logging
-from threading import Lock
+from collections import deque
+from threading import Lock, Thread
 
 # Set up logging
 logger = logging.getLogger('incubator.datalogger')
 
+# Pre-bound formatter for one CSV row. Every column is numeric, so rows are
+# formatted directly rather than going through csv.writer quoting (with the
+# same \r\n terminator it used).
+_FMT = "{},{:.1f},{:.1f},{:d},{:d},{:d},{:.1f},{:.1f}\r\n".format
+
 class DataLogger:
     """
     Class to log incubator data to CSV files for historical tracking.
@@ -23,16 +32,27 @@ class DataLogger:
     HEADERS = ['timestamp', 'temperature', 'humidity', 'heater1_on', 'heater2_on', 'humidifier_on', 
                'target_temperature', 'target_humidity']
     
-    def __init__(self, data_dir='data', retention_days=21):
+    # Maximum number of rows waiting for the background writer
+    QUEUE_SIZE = 10_000
+    
+    # Seconds between purges of expired data files
+    PURGE_INTERVAL = 24 * 60 * 60
+    
+    # Number of recent rows kept in memory (two days at one row per minute)
+    RING_SIZE = 1440 * 2
+    
+    def __init__(self, data_dir='data', retention_days=21, write_period=30.0):
         """
         Initialize the data logger.
         
         Args:
             data_dir: Directory to store CSV data files
             retention_days: Number of days to retain data (older data will be purged)
+            write_period: Seconds between flushes of buffered rows to disk
         """
         self.data_dir = data_dir
         self.retention_days = retention_days
+        self.write_period = write_period
         self.lock = Lock()  # Thread safety for file operations
         
         # Ensure data directory exists
@@ -40,26 +60,45 @@ class DataLogger:
             os.makedirs(data_dir)
             logger.info(f"Created data directory: {data_dir}")
         
-        # Current day's file path
+        # Current day's file path, recomputed only when the date rolls over
         self.current_file = None
+        self._current_date_ordinal = None
         self._update_current_file()
+        
+        # Recent rows as (epoch, temperature, humidity, heater1_on, heater2_on,
+        # humidifier_on, target_temperature, target_humidity) tuples, so short
+        # analytics windows can be served without reading the CSV files
+        self._ring = deque(maxlen=self.RING_SIZE)
+        self._ring_start = time.time()  # Every row logged since then is in the ring until evicted
+        self._last_logged_ts = self._ring_start  # When the newest row entered the ring
+        
+        # Rows are queued by log_data() and written by a background thread,
+        # so the monitoring loop never blocks on disk I/O
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._fd = None
+        self._open_file = None
+        self._last_flush = time.monotonic()
+        self._pending = False  # Rows written to the file but not yet synced
+        self._next_purge = time.monotonic()  # First purge runs as soon as the writer starts
+        self._writer_thread = Thread(target=self._writer_loop, name='datalogger-writer', daemon=True)
+        self._writer_thread.start()
+        
+        # Make sure queued rows reach the disk even on Ctrl-C
+        atexit.register(self.close)
     
     def _update_current_file(self):
         """Update the current file path based on today's date."""
-        today = datetime.datetime.now().strftime('%Y-%m-%d')
-        self.current_file = os.path.join(self.data_dir, f"incubator_{today}.csv")
-        
-        # Create file with headers if it doesn't exist
-        if not os.path.exists(self.current_file):
-            with open(self.current_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(self.HEADERS)
-                logger.info(f"Created new data file: {self.current_file}")
+        today = datetime.date.today()
+        if today.toordinal() == self._current_date_ordinal:
+            return
+        
+        self._current_date_ordinal = today.toordinal()
+        self.current_file = os.path.join(self.data_dir, f"incubator_{today.isoformat()}.csv")
     
     def log_data(self, temperature, humidity, heater1_on, heater2_on, humidifier_on, 
                 target_temperature, target_humidity):
         """
-        Log a data point to the current day's CSV file.
+        Queue a data point to be written to the current day's CSV file.
         
         Args:
             temperature: Current temperature (float)
@@ -70,32 +109,126 @@ class DataLogger:
             target_temperature: Target temperature (float)
             target_humidity: Target humidity (float)
         """
+        # Current timestamp
+        now = time.time()
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        
+        # Keep the row in memory with the same precision as the CSV file
+        self._ring.append((int(now), round(temperature, 1), round(humidity, 1), bool(heater1_on),
+                           bool(heater2_on), bool(humidifier_on), round(target_temperature, 1),
+                           round(target_humidity, 1)))
+        # Marks new analytics data even if the disk write later fails
+        self._last_logged_ts = now
+        
+        row = (timestamp, temperature, humidity, heater1_on, heater2_on, humidifier_on,
+               target_temperature, target_humidity)
+        
+        # Hand the row to the writer thread; drop the oldest row if it has fallen behind
+        while True:
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def _writer_loop(self):
+        """Background thread: drain queued rows and append them to the current CSV file."""
+        running = True
+        while running:
+            # Expired files are purged here, once a day, off the monitoring thread
+            if time.monotonic() >= self._next_purge:
+                self._next_purge = time.monotonic() + self.PURGE_INTERVAL
+                self.purge_old_data()
+            
+            # Wake up at least once per write period so written rows get synced
+            try:
+                batch = [self._queue.get(timeout=self.write_period)]
+            except queue.Empty:
+                self._flush()
+                continue
+            
+            # Drain anything else that queued up while we were waiting
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # A None sentinel from close() stops the thread once earlier rows are written
+            if None in batch:
+                batch = batch[:batch.index(None)]
+                running = False
+            
+            if batch:
+                try:
+                    self._write_rows(batch)
+                except Exception as e:
+                    logger.error(f"Error logging data: {str(e)}")
+            
+            if time.monotonic() - self._last_flush >= self.write_period:
+                self._flush()
+        
+        if self._fd is not None:
+            self._flush()
+            os.close(self._fd)
+            self._fd = None
+    
+    def _flush(self):
+        """Sync written rows through to the SD card."""
+        self._last_flush = time.monotonic()
+        if self._fd is None or not self._pending:
+            return
+        try:
+            # Row data only; the file's metadata doesn't need an extra sync
+            os.fdatasync(self._fd)
+            self._pending = False
+        except Exception as e:
+            logger.error(f"Error flushing data file: {str(e)}")
+    
+    def _write_rows(self, rows):
+        """Write a batch of rows, re-opening the file only when the day rolls over."""
         # Make sure we're using the correct file for today
         self._update_current_file()
         
-        # Current timestamp
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Prepare data row
-        data = [
-            timestamp, 
-            f"{temperature:.1f}", 
-            f"{humidity:.1f}", 
-            '1' if heater1_on else '0',
-            '1' if heater2_on else '0',
-            '1' if humidifier_on else '0',
-            f"{target_temperature:.1f}",
-            f"{target_humidity:.1f}"
-        ]
-        
-        # Safely write to file
-        with self.lock:
-            try:
-                with open(self.current_file, 'a', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(data)
-            except Exception as e:
-                logger.error(f"Error logging data: {str(e)}")
+        if self._fd is None or self._open_file != self.current_file:
+            if self._fd is not None:
+                self._flush()
+                os.close(self._fd)
+                self._fd = None
+            self._fd = os.open(self.current_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._open_file = self.current_file
+            
+            # A new (empty) file starts with the header row
+            if os.fstat(self._fd).st_size == 0:
+                os.write(self._fd, (','.join(self.HEADERS) + '\r\n').encode('ascii'))
+                logger.info(f"Created new data file: {self.current_file}")
+        
+        # Encode the whole batch once and append it with a raw os.write(),
+        # bypassing the buffered text I/O layers
+        data = memoryview("".join([
+            _FMT(timestamp, temperature, humidity, int(heater1_on), int(heater2_on),
+                 int(humidifier_on), target_temperature, target_humidity)
+            for (timestamp, temperature, humidity, heater1_on, heater2_on, humidifier_on,
+                 target_temperature, target_humidity) in rows
+        ]).encode('ascii'))
+        while data:
+            data = data[os.write(self._fd, data):]
+        
+        self._pending = True
+    
+    @property
+    def last_logged_ts(self):
+        """Wall-clock time at which the most recent row was logged."""
+        return self._last_logged_ts
+    
+    def close(self):
+        """Write any queued rows and stop the background writer thread."""
+        if self._writer_thread.is_alive():
+            self._queue.put(None)
+            self._writer_thread.join()
     
     def purge_old_data(self):
         """Remove data files older than retention_days."""
@@ -104,18 +237,15 @@ class DataLogger:
             cutoff = now - datetime.timedelta(days=self.retention_days)
             
             with self.lock:
-                for filename in os.listdir(self.data_dir):
-                    if not filename.startswith('incubator_') or not filename.endswith('.csv'):
-                        continue
+                for file_path in glob.glob(os.path.join(self.data_dir, 'incubator_*.csv')):
+                    filename = os.path.basename(file_path)
                     
-                    # Extract date from filename
+                    # Extract date from filename (incubator_YYYY-MM-DD.csv)
                     try:
-                        date_str = filename.replace('incubator_', '').replace('.csv', '')
-                        file_date = datetime.datetime.strptime(date_str, '%Y-%m-%d')
+                        file_date = datetime.datetime.fromisoformat(filename[10:20])
                         
                         # Delete if older than retention period
                         if file_date < cutoff:
-                            file_path = os.path.join(self.data_dir, filename)
                             os.remove(file_path)
                             logger.info(f"Deleted old data file: {filename}")
                     except (ValueError, OSError) as e:
@@ -123,6 +253,121 @@ class DataLogger:
         except Exception as e:
             logger.error(f"Error during data purge: {str(e)}")
     
+    @staticmethod
+    def _seek(mm, key, lo, hi):
+        """
+        Binary search a memory-mapped CSV file for the first row whose
+        timestamp is at or after key.
+        
+        Rows are appended in time order and start with a fixed-width
+        timestamp, so byte-wise comparison of the line prefix is enough.
+        
+        Args:
+            mm: Memory-mapped file
+            key: Timestamp to search for, as bytes ('YYYY-MM-DD HH:MM:SS')
+            lo: Offset of the first line to consider (must be a line start)
+            hi: Offset just past the last complete line
+        
+        Returns:
+            int: Offset of the matching line, or hi if there is none
+        """
+        while lo < hi:
+            mid = (lo + hi) // 2
+            # Snap back to the start of the line containing mid
+            line_start = mm.rfind(b'\n', lo, mid) + 1 or lo
+            if mm[line_start:line_start + len(key)] < key:
+                lo = mm.find(b'\n', line_start, hi) + 1 or hi
+            else:
+                hi = line_start
+        return lo
+    
+    def _read_samples(self, file_path, key, interval_seconds, samples):
+        """
+        Append rows from one CSV file to samples, starting at the first row
+        at or after key and then skipping ahead by interval_seconds.
+        
+        Only the rows that are returned get parsed; the rest of the file is
+        jumped over with _seek().
+        
+        Args:
+            file_path: Path of the CSV file to read
+            key: Timestamp of the next row wanted, as bytes
+            interval_seconds: Downsampling interval (0 keeps every row)
+            samples: List to append (epoch, temperature, ...) tuples to
+        
+        Returns:
+            bytes: Timestamp of the next row wanted, to continue in the next file
+        """
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return key
+            
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                start = mm.find(b'\n') + 1  # Skip header
+                end = mm.rfind(b'\n') + 1  # Ignore a row that is still being written
+                
+                pos = self._seek(mm, key, start, end)
+                while pos < end:
+                    eol = mm.find(b'\n', pos, end)
+                    row = mm[pos:eol].decode('ascii', errors='replace').rstrip('\r').split(',')
+                    pos = eol + 1
+                    
+                    try:
+                        epoch_time = int(datetime.datetime.fromisoformat(row[0]).timestamp())
+                        samples.append((
+                            epoch_time,
+                            float(row[1]),
+                            float(row[2]),
+                            bool(int(row[3])),
+                            bool(int(row[4])),
+                            bool(int(row[5])),
+                            float(row[6]),
+                            float(row[7])
+                        ))
+                    except (ValueError, IndexError) as e:
+                        logger.warning(f"Error processing data row: {str(e)}")
+                        continue
+                    
+                    if interval_seconds > 0:
+                        next_time = time.localtime(epoch_time + interval_seconds)
+                        key = time.strftime('%Y-%m-%d %H:%M:%S', next_time).encode('ascii')
+                        # Only search when the very next row is still too early
+                        if mm[pos:pos + len(key)] < key:
+                            pos = self._seek(mm, key, pos, end)
+            finally:
+                mm.close()
+        
+        return key
+    
+    def _ring_samples(self, cutoff, interval_seconds):
+        """
+        Get samples at or after cutoff from the in-memory ring, downsampled
+        the same way as the CSV files.
+        
+        Args:
+            cutoff: Start of the window (epoch seconds)
+            interval_seconds: Downsampling interval (0 keeps every row)
+        
+        Returns:
+            list: Sample tuples, or None if the ring doesn't cover the window
+        """
+        rows = list(self._ring)
+        
+        # Once full, the ring only goes back as far as its oldest row
+        covered_from = rows[0][0] if len(rows) == self._ring.maxlen else self._ring_start
+        if covered_from > cutoff:
+            return None
+        
+        samples = []
+        next_time = cutoff
+        for row in rows:
+            if row[0] >= next_time:
+                samples.append(row)
+                if interval_seconds > 0:
+                    next_time = row[0] + interval_seconds
+        return samples
+    
     def get_recent_data(self, days=1, interval_minutes=10):
         """
         Get recent data for analytics, with optional downsampling.
@@ -151,66 +396,46 @@ class DataLogger:
             now = datetime.datetime.now()
             start_date = now - datetime.timedelta(days=days)
             
-            # Get list of files in date range
-            file_dates = []
-            for i in range(days):
-                date = now - datetime.timedelta(days=i)
-                file_dates.append(date.strftime('%Y-%m-%d'))
-            
-            # Read data from each file
-            all_data = []
-            with self.lock:
-                for date_str in file_dates:
-                    file_path = os.path.join(self.data_dir, f"incubator_{date_str}.csv")
-                    if not os.path.exists(file_path):
-                        continue
-                    
-                    with open(file_path, 'r') as f:
-                        reader = csv.reader(f)
-                        next(reader)  # Skip header
-                        for row in reader:
-                            all_data.append(row)
-            
-            # Sort by timestamp
-            all_data.sort(key=lambda x: x[0])
-            
-            # Apply downsampling if needed
-            if interval_minutes > 0:
-                downsampled_data = []
-                last_sample_time = None
-                
-                for row in all_data:
-                    try:
-                        row_time = datetime.datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
-                        
-                        if last_sample_time is None or (row_time - last_sample_time).total_seconds() >= interval_minutes * 60:
-                            downsampled_data.append(row)
-                            last_sample_time = row_time
-                    except (ValueError, IndexError):
-                        continue
-                
-                all_data = downsampled_data
+            # Short windows are usually served from memory
+            samples = self._ring_samples(int(start_date.timestamp()), interval_minutes * 60)
+            if samples is None:
+                samples = self._read_files(start_date, interval_minutes * 60)
             
-            # Fill result structure
-            for row in all_data:
-                try:
-                    # Convert timestamp string to epoch timestamp (seconds since epoch)
-                    dt = datetime.datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
-                    epoch_time = int(dt.timestamp())
-                    
-                    # Add data to result structure
-                    result['timestamp'].append(epoch_time)
-                    result['temperature'].append(float(row[1]))
-                    result['humidity'].append(float(row[2]))
-                    result['heater1_on'].append(bool(int(row[3])))
-                    result['heater2_on'].append(bool(int(row[4])))
-                    result['humidifier_on'].append(bool(int(row[5])))
-                    result['target_temperature'].append(float(row[6]))
-                    result['target_humidity'].append(float(row[7]))
-                except (ValueError, IndexError) as e:
-                    logger.warning(f"Error processing data row: {str(e)}")
+            # Transpose the samples into the column lists
+            for column, values in zip(self.HEADERS, zip(*samples)):
+                result[column] = list(values)
             
         except Exception as e:
             logger.error(f"Error retrieving recent data: {str(e)}")
         
-        return result
\ No newline at end of file
+        return result
+    
+    def _read_files(self, start_date, interval_seconds):
+        """
+        Get samples from start_date onwards from the CSV files.
+        
+        Args:
+            start_date: Start of the window (datetime)
+            interval_seconds: Downsampling interval (0 keeps every row)
+        
+        Returns:
+            list: Sample tuples in time order
+        """
+        now = datetime.datetime.now()
+        
+        # Files in the date range, oldest first so rows come out in time order
+        file_count = (now.date() - start_date.date()).days + 1
+        file_dates = [(start_date.date() + datetime.timedelta(days=i)).isoformat() for i in range(file_count)]
+        
+        # Read samples from each file, starting at the beginning of the window
+        key = start_date.strftime('%Y-%m-%d %H:%M:%S').encode('ascii')
+        samples = []
+        with self.lock:
+            for date_str in file_dates:
+                file_path = os.path.join(self.data_dir, f"incubator_{date_str}.csv")
+                if not os.path.exists(file_path):
+                    continue
+                
+                key = self._read_samples(file_path, key, interval_seconds, samples)
+        
+        return samples
@@ -1,13 +1,14 @@
 import logging
-import time
-import os
 
-# Set environment variable to use mock pins
-os.environ['GPIOZERO_PIN_FACTORY'] = 'mock'
+# Choose the pin factory (lgpio, then pigpio, then mock) unless one is already set
+from pin_factory import select_pin_factory
+select_pin_factory()
 
 # Use gpiozero instead of RPi.GPIO directly
 from gpiozero import Button
 
+from relay_controller import RelayController
+
 logger = logging.getLogger('incubator.emergency')
 
 class EmergencyHandler:
@@ -27,6 +28,8 @@ class EmergencyHandler:
             relay_controller: Instance of RelayController to control relays during emergencies
         """
         self.relay_controller = relay_controller
+        # Relays that must be switched off in an emergency
+        self._critical_channels = (RelayController.HEATER1, RelayController.HEATER2)
         self.is_overheat = False
         self.overheat_sensor = None
         logger.info("Emergency handler initialized")
@@ -37,7 +40,10 @@ class EmergencyHandler:
             # Create a Button object for the overheat sensor
             # We use pull_up=True because the circuit is normally closed (pulled LOW)
             # When overheating occurs, the circuit opens and goes HIGH
-            self.overheat_sensor = Button(self.OVERHEAT_SENSOR_PIN, pull_up=True)
+            # bounce_time lets gpiozero drop contact chatter at the edge
+            # instead of blocking the callback thread to debounce
+            self.overheat_sensor = Button(self.OVERHEAT_SENSOR_PIN, pull_up=True,
+                                          bounce_time=0.1)
             
             # Set up a callback for when the button is pressed (circuit opens)
             self.overheat_sensor.when_pressed = self._overheat_callback
@@ -51,12 +57,9 @@ class EmergencyHandler:
         """
         Callback function triggered when overheat sensor detects overheating.
         """
-        # Add debounce by waiting a moment and checking again
-        time.sleep(0.1)
-        if self.overheat_sensor and self.overheat_sensor.is_pressed:
-            logger.critical("OVERHEAT DETECTED! Initiating emergency shutdown.")
-            self.is_overheat = True
-            self.emergency_shutdown()
+        logger.critical("OVERHEAT DETECTED! Initiating emergency shutdown.")
+        self.is_overheat = True
+        self.emergency_shutdown()
     
     def check_overheat(self):
         """
@@ -66,10 +69,11 @@ class EmergencyHandler:
             bool: True if overheat condition exists, False otherwise
         """
         try:
-            if self.overheat_sensor and hasattr(self.overheat_sensor, 'is_pressed'):
+            sensor = self.overheat_sensor
+            if sensor is not None:
                 # For gpiozero Button, is_pressed is True when the button is pressed
                 # For our overheat sensor, this means the circuit is open (HIGH)
-                self.is_overheat = self.overheat_sensor.is_pressed
+                self.is_overheat = sensor.is_pressed
                 return self.is_overheat
             else:
                 # If sensor not initialized or already closed, don't report overheat
@@ -92,12 +96,10 @@ class EmergencyHandler:
         
         try:
             # Turn off critical relays (heaters)
-            from relay_controller import RelayController
-            self.relay_controller.turn_off_relay(RelayController.HEATER1)
-            self.relay_controller.turn_off_relay(RelayController.HEATER2)
+            self.relay_controller.turn_off_channels(self._critical_channels)
             
-            # Could also turn off humidifier if needed
-            # self.relay_controller.turn_off_relay(RelayController.HUMIDIFIER)
+            # Could also turn off humidifier if needed by adding
+            # RelayController.HUMIDIFIER to _critical_channels
             
             logger.info("Emergency shutdown complete - all heaters disabled")
         except Exception as e:
@@ -136,8 +138,7 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO,
                         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     
-    # Import and create relay controller
-    from relay_controller import RelayController
+    # Create relay controller
     relay_controller = RelayController()
     
     # Create emergency handler
@@ -154,11 +155,10 @@ if __name__ == "__main__":
         # Test emergency shutdown
         handler.emergency_shutdown()
         
-        # Monitor for 30 seconds
-        for i in range(30):
-            status = "OVERHEAT DETECTED" if handler.check_overheat() else "Normal"
-            print(f"Monitoring ({i+1}/30): {status}")
-            time.sleep(1)
+        # Report state changes from the GPIO edges until interrupted
+        handler.overheat_sensor.when_released = lambda: print("Normal")
+        from signal import pause
+        pause()
             
     except KeyboardInterrupt:
         print("Test interrupted")
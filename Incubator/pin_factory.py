@@ -0,0 +1,55 @@
+"""
+Pin factory selection for the incubator GPIO modules.
+Picks the gpiozero pin factory before any GPIO device is created.
+"""
+
+import os
+import glob
+import logging
+
+logger = logging.getLogger('incubator.gpio')
+
+
+def select_pin_factory():
+    """
+    Set GPIOZERO_PIN_FACTORY unless it has already been chosen.
+
+    Prefers lgpio (kernel GPIO character device, edge events without a
+    polling thread), then pigpio (needs the pigpiod daemon), and falls back
+    to mock pins when neither is usable.
+
+    Returns:
+        str: The pin factory name in use
+    """
+    factory = os.environ.get('GPIOZERO_PIN_FACTORY')
+    if factory:
+        return factory
+
+    factory = 'mock'
+    try:
+        import lgpio
+        if glob.glob('/dev/gpiochip*'):
+            factory = 'lgpio'
+    except ImportError:
+        pass
+
+    if factory == 'mock':
+        try:
+            import pigpio
+            # Only usable if the pigpiod daemon is running
+            pi = pigpio.pi(show_errors=False)
+            if pi.connected:
+                factory = 'pigpio'
+            pi.stop()
+        except ImportError:
+            pass
+
+    if factory == 'mock':
+        # Relays and the overheat input do nothing on mock pins, so make an
+        # automatic fallback visible instead of silently faking the hardware
+        logger.warning("Neither lgpio nor pigpiod is usable - falling back to MOCK GPIO pins; "
+                       "relays will not switch and overheat detection is disabled. "
+                       "Set GPIOZERO_PIN_FACTORY=mock to use mock pins deliberately.")
+
+    os.environ['GPIOZERO_PIN_FACTORY'] = factory
+    return factory
@@ -1,15 +1,26 @@
 import logging
+import mmap
 import time
 import os
 
-# Set environment variable to use mock pins
-os.environ['GPIOZERO_PIN_FACTORY'] = 'mock'
+# Choose the pin factory (lgpio, then pigpio, then mock) unless one is already set
+from pin_factory import select_pin_factory
+select_pin_factory()
 
 # Use gpiozero instead of RPi.GPIO directly
 from gpiozero import DigitalOutputDevice
+from gpiozero.pins.mock import MockFactory
 
 logger = logging.getLogger('incubator.relay')
 
+# SoCs sharing the BCM2835 GPIO register layout (the Pi 5 uses a different
+# GPIO block and always takes the per-pin path)
+_GPIO_REGISTER_SOCS = (b'brcm,bcm2835', b'brcm,bcm2836', b'brcm,bcm2837', b'brcm,bcm2711')
+_GPCLR0 = 0x28 // 4  # Output clear register for GPIO 0-31, as a 32-bit word index
+
+# GPIO pin for each relay channel, indexed by channel number
+_PINS = (17, 18, 27, 22, 23, 24, 25, 4)
+
 class RelayController:
     """
     Class to control relays connected to Raspberry Pi GPIO pins.
@@ -33,41 +44,50 @@ class RelayController:
     
     def __init__(self):
         """Initialize the GPIO pins for relay control."""
-        # Map relay channels to GPIO pins
-        self.relay_pins = {
-            self.HEATER1: 17,
-            self.HEATER2: 18,
-            self.HUMIDIFIER: 27,
-            self.RELAY4: 22,
-            self.RELAY5: 23,
-            self.RELAY6: 24,
-            self.RELAY7: 25,
-            self.RELAY8: 4
-        }
+        # GPIO pin for each relay channel (channels are indices 0-7)
+        self._pins = _PINS
         
         # Set up all relay pins as outputs using gpiozero
         # Using active_high=True as requested by the user (HIGH = ON, LOW = OFF)
-        self.relay_devices = {}
-        for channel, pin in self.relay_pins.items():
-            # Create a digital output device with initial value of False (LOW = relay OFF)
-            # active_high=True means that the output is considered "on" when the pin is HIGH
-            self.relay_devices[channel] = DigitalOutputDevice(pin, active_high=True, initial_value=False)
-            # Now the relay is OFF - set_value(True) will turn it ON, set_value(False) will turn it OFF
-        
-        # Track relay states (True = ON, False = OFF)
-        self.relay_states = {
-            self.HEATER1: False,
-            self.HEATER2: False,
-            self.HUMIDIFIER: False,
-            self.RELAY4: False,
-            self.RELAY5: False,
-            self.RELAY6: False,
-            self.RELAY7: False,
-            self.RELAY8: False
-        }
+        # Each device is created with initial value of False (LOW = relay OFF);
+        # on() will turn it ON, off() will turn it OFF
+        self.relay_devices = [DigitalOutputDevice(pin, active_high=True, initial_value=False)
+                              for pin in self._pins]
+        
+        # Track relay states by channel (1 = ON, 0 = OFF)
+        self.relay_states = bytearray(len(self._pins))
+        
+        # Map the GPIO registers so all relays can be cleared in one write
+        self._off_mask = sum(1 << pin for pin in self._pins)
+        self._gpio_mem, self._gpio_regs = self._map_gpio_registers()
         
         logger.info("Relay controller initialized with all relays OFF")
 
+    def _map_gpio_registers(self):
+        """
+        Map the GPIO register block through /dev/gpiomem.
+        
+        Returns:
+            tuple: (mmap, 32-bit register view), or (None, None) when the pins
+            are mocked or the board does not use the BCM2835 register layout
+        """
+        if isinstance(self.relay_devices[self.HEATER1].pin_factory, MockFactory):
+            return None, None
+        try:
+            with open('/proc/device-tree/compatible', 'rb') as f:
+                compatible = f.read().split(b'\0')
+            if not any(soc in compatible for soc in _GPIO_REGISTER_SOCS):
+                return None, None
+            fd = os.open('/dev/gpiomem', os.O_RDWR | os.O_SYNC)
+            try:
+                mem = mmap.mmap(fd, 4096)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"GPIO register access unavailable, using per-pin writes: {e}")
+            return None, None
+        return mem, memoryview(mem).cast('I')
+
     def turn_on_relay(self, relay_channel):
         """
         Turn ON a specific relay.
@@ -75,30 +95,33 @@ class RelayController:
         Args:
             relay_channel: The relay channel to turn on
         """
-        if relay_channel not in self.relay_devices:
+        if not 0 <= relay_channel < len(self._pins):
             raise ValueError(f"Invalid relay channel: {relay_channel}")
+        if self.relay_states[relay_channel]:
+            return  # Already ON - skip the redundant GPIO write
         
         # Turn ON the relay using gpiozero (on = True for active_high=True)
         self.relay_devices[relay_channel].on()
-        self.relay_states[relay_channel] = True
-        pin = self.relay_pins[relay_channel]
-        logger.info(f"Relay channel {relay_channel} turned ON (Pin {pin})")
+        self.relay_states[relay_channel] = 1
+        logger.debug("Relay channel %d turned ON (Pin %d)", relay_channel, self._pins[relay_channel])
 
-    def turn_off_relay(self, relay_channel):
+    def turn_off_relay(self, relay_channel, force=False):
         """
         Turn OFF a specific relay.
         
         Args:
             relay_channel: The relay channel to turn off
+            force: Drive the pin LOW even if the relay is already tracked as OFF
         """
-        if relay_channel not in self.relay_devices:
+        if not 0 <= relay_channel < len(self._pins):
             raise ValueError(f"Invalid relay channel: {relay_channel}")
+        if not force and not self.relay_states[relay_channel]:
+            return  # Already OFF - skip the redundant GPIO write
         
         # Turn OFF the relay using gpiozero (off = False for active_high=True)
         self.relay_devices[relay_channel].off()
-        self.relay_states[relay_channel] = False
-        pin = self.relay_pins[relay_channel]
-        logger.info(f"Relay channel {relay_channel} turned OFF (Pin {pin})")
+        self.relay_states[relay_channel] = 0
+        logger.debug("Relay channel %d turned OFF (Pin %d)", relay_channel, self._pins[relay_channel])
 
     def toggle_relay(self, relay_channel):
         """
@@ -122,29 +145,81 @@ class RelayController:
         Returns:
             bool: True if relay is ON, False if OFF
         """
-        if relay_channel not in self.relay_states:
+        if not 0 <= relay_channel < len(self._pins):
             raise ValueError(f"Invalid relay channel: {relay_channel}")
         
-        return self.relay_states[relay_channel]
+        return bool(self.relay_states[relay_channel])
+
+    def get_all_states(self):
+        """
+        Get the states of the heaters and humidifier in a single call.
+        
+        Returns:
+            tuple: (heater1_on, heater2_on, humidifier_on)
+        """
+        states = self.relay_states
+        return bool(states[self.HEATER1]), bool(states[self.HEATER2]), bool(states[self.HUMIDIFIER])
+
+    def turn_off_channels(self, channels):
+        """
+        Turn OFF several relays at once, always writing the pins.
+        
+        Args:
+            channels: Sequence of relay channels to turn off
+        """
+        pins = self._pins
+        if self._gpio_regs is not None:
+            mask = 0
+            for channel in channels:
+                if not 0 <= channel < len(pins):
+                    raise ValueError(f"Invalid relay channel: {channel}")
+                mask |= 1 << pins[channel]
+            # One 32-bit store to GPCLR0 drives all the requested pins LOW
+            self._gpio_regs[_GPCLR0] = mask
+            for channel in channels:
+                self.relay_states[channel] = 0
+        else:
+            for channel in channels:
+                self.turn_off_relay(channel, force=True)
+        logger.debug("Relay channels %s turned OFF", channels)
+
+    def turn_off_all_heaters(self):
+        """Turn OFF both heaters, always writing the pins."""
+        self.turn_off_channels((self.HEATER1, self.HEATER2))
 
     def turn_off_all_relays(self):
         """Turn OFF all relays."""
-        for channel in self.relay_pins:
-            self.turn_off_relay(channel)
-        logger.info("All relays turned OFF")
+        if self._gpio_regs is not None:
+            # One 32-bit store to GPCLR0 drives every relay pin LOW at once
+            self._gpio_regs[_GPCLR0] = self._off_mask
+            self.relay_states[:] = bytes(len(self._pins))
+        else:
+            for channel in range(len(self._pins)):
+                self.turn_off_relay(channel, force=True)
+        logger.info("All relays turned OFF (Pins %s)", ", ".join(map(str, self._pins)))
 
-    def cleanup(self):
+    def cleanup(self, settle_time=0.0):
         """
         Clean up GPIO resources. Should be called when program exits.
+        
+        Args:
+            settle_time: Seconds to wait after switching the relays off before
+                releasing the pins (for mechanical relays, e.g. 0.1)
         """
         # Make sure all relays are turned off first
         self.turn_off_all_relays()
-        time.sleep(0.1)  # Small delay to ensure relays have time to respond
+        if settle_time > 0:
+            time.sleep(settle_time)  # Give mechanical relay contacts time to open
         
         # Close all devices
-        for device in self.relay_devices.values():
+        for device in self.relay_devices:
             device.close()
         
+        if self._gpio_mem is not None:
+            self._gpio_regs.release()
+            self._gpio_mem.close()
+            self._gpio_mem = self._gpio_regs = None
+        
         logger.info("GPIO cleanup completed")
 
 
@@ -1,10 +1,10 @@
 import time
+import ctypes
 import logging
-import math
-import os
 
 try:
     import smbus2
+    from smbus2 import i2c_msg
     SMBUS_AVAILABLE = True
 except ImportError:
     SMBUS_AVAILABLE = False
@@ -12,6 +12,25 @@ except ImportError:
 
 logger = logging.getLogger('incubator.sensor')
 
+def _crc8_entry(value):
+    """Run the SHT30 CRC-8 polynomial (0x31) over one byte value."""
+    for _ in range(8):
+        if value & 0x80:
+            value = ((value << 1) ^ 0x31) & 0xFF
+        else:
+            value = (value << 1) & 0xFF
+    return value
+
+# Precomputed CRC-8 lookup table: one indexing step per byte instead of an
+# 8-step shift loop
+_CRC8_TABLE = bytes(_crc8_entry(i) for i in range(256))
+
+# Raw 16-bit reading -> degrees Fahrenheit / percent RH, folded into a single
+# multiply-add (T_C = -45 + 175 * raw / 65535, T_F = T_C * 9/5 + 32)
+_T_SCALE_F = 175.0 * 9.0 / 5.0 / 65535.0
+_T_OFFSET_F = -45.0 * 9.0 / 5.0 + 32.0
+_H_SCALE = 100.0 / 65535.0
+
 class SensorReader:
     """
     Class to read temperature and humidity data from an SHT30 sensor 
@@ -37,7 +56,18 @@ class SensorReader:
         """
         self.initialized = False
         
+        # Last raw (temperature, humidity) words and the result they produced
+        self._last_raw = (-1, -1)
+        self._last_out = None
+        
         if SMBUS_AVAILABLE:
+            # I2C messages and the read buffer are built once and reused on every read
+            cmd = self.SHT30_READ_HIGH_REPEATABILITY
+            self._trigger_msg = i2c_msg.write(self.SHT30_ADDRESS, [cmd >> 8, cmd & 0xFF])
+            self._read_msg = i2c_msg.read(self.SHT30_ADDRESS, 6)
+            self._buf = bytearray(6)
+            self._buf_view = (ctypes.c_char * 6).from_buffer(self._buf)
+            
             try:
                 self.bus = smbus2.SMBus(bus_number)
                 
@@ -63,33 +93,8 @@ class SensorReader:
         if not self.initialized:
             raise ValueError("Sensor not initialized")
             
-        cmd_msb = cmd >> 8
-        cmd_lsb = cmd & 0xFF
-        
-        self.bus.write_i2c_block_data(self.SHT30_ADDRESS, cmd_msb, [cmd_lsb])
-    
-    def _calculate_crc(self, data):
-        """
-        Calculate CRC checksum for SHT30 readings.
-        
-        Args:
-            data: List of bytes to calculate CRC for
-            
-        Returns:
-            int: CRC8 checksum
-        """
-        crc = 0xFF  # Initial value
-        polynomial = 0x31  # Polynomial: x^8 + x^5 + x^4 + 1 = 0x31
-        
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x80:
-                    crc = ((crc << 1) ^ polynomial) & 0xFF
-                else:
-                    crc = (crc << 1) & 0xFF
-                    
-        return crc
+        # [addr][cmd MSB][cmd LSB] - same frame as a one-byte block write
+        self.bus.write_byte_data(self.SHT30_ADDRESS, cmd >> 8, cmd & 0xFF)
     
     def read_sensor(self):
         """
@@ -107,42 +112,39 @@ class SensorReader:
             
         # Try to read from the sensor
         try:
-            # Send measurement command
-            self._send_command(self.SHT30_READ_HIGH_REPEATABILITY)
+            # Send measurement command as a single raw I2C write
+            self.bus.i2c_rdwr(self._trigger_msg)
             
-            # Wait for measurement to complete (15ms typical for high repeatability)
-            time.sleep(0.02)
+            # Wait for measurement to complete (15ms max for high repeatability)
+            time.sleep(0.016)
             
             # Read 6 bytes of data: temp MSB, temp LSB, temp CRC, humidity MSB, humidity LSB, humidity CRC
-            data = self.bus.read_i2c_block_data(self.SHT30_ADDRESS, 0, 6)
+            self.bus.i2c_rdwr(self._read_msg)
+            buf = self._buf
+            ctypes.memmove(self._buf_view, self._read_msg.buf, 6)
             
-            # Verify CRC checksums
-            temp_data = data[0:2]
-            temp_crc = data[2]
-            hum_data = data[3:5]
-            hum_crc = data[5]
+            # Verify CRC checksums in-line against the lookup table
+            table = _CRC8_TABLE
+            temp_crc = table[table[0xFF ^ buf[0]] ^ buf[1]]
+            hum_crc = table[table[0xFF ^ buf[3]] ^ buf[4]]
             
-            calculated_temp_crc = self._calculate_crc(temp_data)
-            calculated_hum_crc = self._calculate_crc(hum_data)
-            
-            if temp_crc != calculated_temp_crc or hum_crc != calculated_hum_crc:
-                logger.warning(f"CRC checksum failed: {temp_crc}!={calculated_temp_crc} or {hum_crc}!={calculated_hum_crc}")
+            if temp_crc != buf[2] or hum_crc != buf[5]:
+                logger.warning(f"CRC checksum failed: {buf[2]}!={temp_crc} or {buf[5]}!={hum_crc}")
                 raise ValueError("CRC checksum verification failed")
             
-            # Calculate temperature in Celsius
-            temp_msb = data[0]
-            temp_lsb = data[1]
-            temp_raw = (temp_msb << 8) | temp_lsb
-            temperature_c = -45 + (175 * temp_raw / 65535.0)
+            temp_raw = (buf[0] << 8) | buf[1]
+            humidity_raw = (buf[3] << 8) | buf[4]
+            
+            # Unchanged raw words give the same result as last time
+            raw = (temp_raw, humidity_raw)
+            if raw == self._last_raw:
+                return self._last_out
             
-            # Convert to Fahrenheit
-            temperature_f = (temperature_c * 9/5) + 32
+            # Calculate temperature in Fahrenheit
+            temperature_f = _T_OFFSET_F + _T_SCALE_F * temp_raw
             
             # Calculate humidity
-            humidity_msb = data[3]
-            humidity_lsb = data[4]
-            humidity_raw = (humidity_msb << 8) | humidity_lsb
-            relative_humidity = 100 * humidity_raw / 65535.0
+            relative_humidity = _H_SCALE * humidity_raw
             
             # Round to one decimal place for display
             temperature_f = round(temperature_f, 1)
@@ -155,7 +157,9 @@ class SensorReader:
                 temperature_f = max(32.0, min(212.0, temperature_f))
                 relative_humidity = max(0.0, min(100.0, relative_humidity))
             
-            return temperature_f, relative_humidity
+            self._last_raw = raw
+            self._last_out = (temperature_f, relative_humidity)
+            return self._last_out
             
         except Exception as e:
             logger.error(f"Error reading SHT30 sensor: {e}")
@@ -4,6 +4,7 @@
 let overheatingActive = false;
 let updateInterval;
 let lastUpdateTime = 0;
+let lastReadingTime = null;
 let autoTempControlEnabled = false;
 let autoHumidityControlEnabled = false;
 let targetTemperature = 99.5;
@@ -33,7 +34,7 @@ document.addEventListener('DOMContentLoaded', function() {
     updateStatus();
     
     // Set up auto-refresh
-    updateInterval = setInterval(updateStatus, 7000); // Update every 7 seconds
+    startStatusUpdates();
 });
 
 // Setup listeners for control switches
@@ -127,105 +128,144 @@ function updateStatus() {
             }
             return response.json();
         })
-        .then(data => {
-            console.log('Status update received:', data);
-            
-            // Get target values from the server
-            if (data.target_temperature !== undefined) {
-                targetTemperature = data.target_temperature;
-                const currentTempTarget = document.getElementById('current-temp-target');
-                if (currentTempTarget) {
-                    currentTempTarget.textContent = `${targetTemperature.toFixed(1)} °F`;
-                }
-                
-                const targetTempInput = document.getElementById('target-temp');
-                if (targetTempInput) {
-                    targetTempInput.value = targetTemperature;
-                }
-            }
-            
-            if (data.target_humidity !== undefined) {
-                targetHumidity = data.target_humidity;
-                const currentHumidityTarget = document.getElementById('current-humidity-target');
-                if (currentHumidityTarget) {
-                    currentHumidityTarget.textContent = `${targetHumidity.toFixed(0)} %`;
-                }
-                
-                const targetHumidityInput = document.getElementById('target-humidity');
-                if (targetHumidityInput) {
-                    targetHumidityInput.value = targetHumidity;
-                }
-            }
-            
-            // Update last refresh time
-            lastUpdateTime = new Date();
-            document.getElementById('last-updated').textContent = formatTimestamp(lastUpdateTime);
-            
-            // Update temperature and humidity displays
-            updateReadingDisplay('temperature', data.temperature);
-            updateReadingDisplay('humidity', data.humidity);
-            
-            // Update control toggles state
-            const heater1Toggle = document.getElementById('heater1-toggle');
-            const heater2Toggle = document.getElementById('heater2-toggle');
-            const humidifierToggle = document.getElementById('humidifier-toggle');
-            const humidityOverrideToggle = document.getElementById('humidity-override-toggle');
-            const autoToggle = document.getElementById('auto-control-toggle');
-            
-            // Update controls but don't trigger events
-            if (heater1Toggle) {
-                if (heater1Toggle.checked !== data.heater1_on) {
-                    heater1Toggle.checked = data.heater1_on;
-                }
-                updateControlStatus('heater1', data.heater1_on);
-            }
-            
-            if (heater2Toggle) {
-                if (heater2Toggle.checked !== data.heater2_on) {
-                    heater2Toggle.checked = data.heater2_on;
-                }
-                updateControlStatus('heater2', data.heater2_on);
-            }
-            
-            if (humidifierToggle) {
-                if (humidifierToggle.checked !== data.humidifier_on) {
-                    humidifierToggle.checked = data.humidifier_on;
-                }
-                updateControlStatus('humidifier', data.humidifier_on);
-            }
-            
-            // Make sure toggle states are correct
-            if (autoToggle && autoToggle.checked !== autoControlEnabled) {
-                autoToggle.checked = autoControlEnabled;
-            }
-            
-            if (humidityOverrideToggle && humidityOverrideToggle.checked !== humidityOverride) {
-                humidityOverrideToggle.checked = humidityOverride;
-            }
-            
-            // Handle overheat condition
-            overheatingActive = data.is_overheat;
-            
-            if (overheatingActive) {
-                // Show overheat warning
-                showOverheatWarning();
-            } else {
-                // Hide overheat warning if it exists
-                hideOverheatWarning();
-            }
-            
-            // Update controls availability based on current states
-            updateControlsAvailability();
-            
-            // Display alerts
-            displayAlerts(data.alerts);
-        })
+        .then(renderStatus)
         .catch(error => {
             console.error('Error fetching status:', error);
             showAlert('danger', `Failed to update status: ${error.message}`);
         });
 }
 
+// Render a status snapshot from /api/status or the status stream
+function renderStatus(data) {
+    console.log('Status update received:', data);
+    
+    // Get target values from the server
+    if (data.target_temperature !== undefined) {
+        targetTemperature = data.target_temperature;
+        const currentTempTarget = document.getElementById('current-temp-target');
+        if (currentTempTarget) {
+            currentTempTarget.textContent = `${targetTemperature.toFixed(1)} °F`;
+        }
+        
+        const targetTempInput = document.getElementById('target-temp');
+        if (targetTempInput) {
+            targetTempInput.value = targetTemperature;
+        }
+    }
+    
+    if (data.target_humidity !== undefined) {
+        targetHumidity = data.target_humidity;
+        const currentHumidityTarget = document.getElementById('current-humidity-target');
+        if (currentHumidityTarget) {
+            currentHumidityTarget.textContent = `${targetHumidity.toFixed(0)} %`;
+        }
+        
+        const targetHumidityInput = document.getElementById('target-humidity');
+        if (targetHumidityInput) {
+            targetHumidityInput.value = targetHumidity;
+        }
+    }
+    
+    // Update last refresh time
+    lastUpdateTime = new Date();
+    document.getElementById('last-updated').textContent = formatTimestamp(lastUpdateTime);
+    
+    // Update temperature and humidity displays
+    updateReadingDisplay('temperature', data.temperature);
+    updateReadingDisplay('humidity', data.humidity);
+    
+    // Update control toggles state
+    const heater1Toggle = document.getElementById('heater1-toggle');
+    const heater2Toggle = document.getElementById('heater2-toggle');
+    const humidifierToggle = document.getElementById('humidifier-toggle');
+    const humidityOverrideToggle = document.getElementById('humidity-override-toggle');
+    const autoToggle = document.getElementById('auto-control-toggle');
+    
+    // Update controls but don't trigger events
+    if (heater1Toggle) {
+        if (heater1Toggle.checked !== data.heater1_on) {
+            heater1Toggle.checked = data.heater1_on;
+        }
+        updateControlStatus('heater1', data.heater1_on);
+    }
+    
+    if (heater2Toggle) {
+        if (heater2Toggle.checked !== data.heater2_on) {
+            heater2Toggle.checked = data.heater2_on;
+        }
+        updateControlStatus('heater2', data.heater2_on);
+    }
+    
+    if (humidifierToggle) {
+        if (humidifierToggle.checked !== data.humidifier_on) {
+            humidifierToggle.checked = data.humidifier_on;
+        }
+        updateControlStatus('humidifier', data.humidifier_on);
+    }
+    
+    // Make sure toggle states are correct
+    if (autoToggle && autoToggle.checked !== autoControlEnabled) {
+        autoToggle.checked = autoControlEnabled;
+    }
+    
+    if (humidityOverrideToggle && humidityOverrideToggle.checked !== humidityOverride) {
+        humidityOverrideToggle.checked = humidityOverride;
+    }
+    
+    // Handle overheat condition
+    overheatingActive = data.is_overheat;
+    
+    if (overheatingActive) {
+        // Show overheat warning
+        showOverheatWarning();
+    } else {
+        // Hide overheat warning if it exists
+        hideOverheatWarning();
+    }
+    
+    // Update controls availability based on current states
+    updateControlsAvailability();
+    
+    // Display alerts
+    displayAlerts(data.alerts);
+}
+
+// Receive status updates pushed by the server, falling back to polling
+// while the stream is unavailable
+function startStatusUpdates() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    
+    const source = new EventSource('/api/status/stream');
+    source.onopen = stopPolling;
+    source.onerror = startPolling;
+    source.onmessage = function(event) {
+        const data = JSON.parse(event.data);
+        renderStatus(data);
+        
+        // Run auto control once per new sensor reading, not on every push
+        if (data.last_updated !== lastReadingTime) {
+            lastReadingTime = data.last_updated;
+            applyAutoControl();
+        }
+    };
+}
+
+function startPolling() {
+    if (!updateInterval) {
+        updateInterval = setInterval(updateStatus, 7000); // Update every 7 seconds
+    }
+}
+
+function stopPolling() {
+    if (updateInterval) {
+        clearInterval(updateInterval);
+        updateInterval = null;
+    }
+}
+
 // Update temperature or humidity reading display
 function updateReadingDisplay(type, value) {
     const element = document.getElementById(`${type}-value`);
@@ -692,12 +732,8 @@ function sendSettingUpdate(setting, value) {
     });
 }
 
-// Add auto control to the status update function
-const originalUpdateStatus = updateStatus;
-updateStatus = function() {
-    originalUpdateStatus();
-    
-    // Apply auto control on each status update
+// Apply auto control after a status update
+function applyAutoControl() {
     if (autoTempControlEnabled) {
         setTimeout(applyTempControl, 1000); // Slight delay to ensure latest data
     }
@@ -705,6 +741,15 @@ updateStatus = function() {
     if (autoHumidityControlEnabled && !humidityOverride) {
         setTimeout(applyHumidityControl, 1000);
     }
+}
+
+// Add auto control to the status update function
+const originalUpdateStatus = updateStatus;
+updateStatus = function() {
+    originalUpdateStatus();
+    
+    // Apply auto control on each status update
+    applyAutoControl();
 };
 
 // Cleanup function to execute when page is unloaded